@@ -10,15 +10,18 @@ is represented by a conjunction of (more of less complex) linear constraints.
 """
 import sys
 from abc import ABCMeta
-from copy import deepcopy
+from copy import deepcopy, copy
 from enum import IntEnum
-from typing import Set, Type
+from typing import Set, Type, Iterable, Tuple, List
 
 from apronpy.abstract1 import Abstract1, PyAbstract1
+from apronpy.coeff import PyMPQScalarCoeff
 from apronpy.environment import PyEnvironment
+from apronpy.lincons0 import ConsTyp
 from apronpy.linexpr1 import PyLinexpr1
 from apronpy.manager import PyManager
 from apronpy.tcons1 import PyTcons1Array, PyTcons1
+from apronpy.texpr0 import TexprOp, TexprRtype, TexprRdir
 from apronpy.texpr1 import PyTexpr1
 from apronpy.var import PyVar
 
@@ -28,6 +31,27 @@ from libra.core.expressions import VariableIdentifier, Expression, BinaryBoolean
 from libra.core.utils import copy_docstring
 
 
+rtype = TexprRtype.AP_RTYPE_REAL
+rdir = TexprRdir.AP_RDIR_RND
+
+
+def box2apron(ranges: Iterable[Tuple[VariableIdentifier, Tuple[float, float]]], environment: PyEnvironment):
+    """Convert bounds on some variables into APRON constraints
+
+    :param ranges: variables paired with their lower and upper bounds
+    :param environment: APRON environment of the constraints
+    :return: list of APRON constraints bounding each variable between its lower and upper bound
+    """
+    constraints: List[PyTcons1] = list()
+    for variable, (lower, upper) in ranges:
+        var = PyTexpr1.var(environment, PyVar(variable.name))
+        inf = PyTexpr1.cst(environment, PyMPQScalarCoeff(float(lower)))
+        sup = PyTexpr1.cst(environment, PyMPQScalarCoeff(float(upper)))
+        constraints.append(PyTcons1.make(PyTexpr1.binop(TexprOp.AP_TEXPR_SUB, var, inf, rtype, rdir), ConsTyp.AP_CONS_SUPEQ))
+        constraints.append(PyTcons1.make(PyTexpr1.binop(TexprOp.AP_TEXPR_SUB, sup, var, rtype, rdir), ConsTyp.AP_CONS_SUPEQ))
+    return constraints
+
+
 class APRONState(State, metaclass=ABCMeta):
     """Analysis state based on APRON. An element of the abstract domain.
 
@@ -54,6 +78,14 @@ class APRONState(State, metaclass=ABCMeta):
         self.domain = domain
         self.state = self.domain(manager, self.environment)
 
+    def __deepcopy__(self, memo):
+        # the environment is shared, everything else is copied
+        state = self.__class__.__new__(self.__class__)
+        memo[id(self)] = state
+        for name, value in self.__dict__.items():
+            state.__dict__[name] = value if name == 'environment' else deepcopy(value, memo)
+        return state
+
     @copy_docstring(State.bottom)
     def bottom(self, manager: PyManager = None):
         assert manager is not None
@@ -71,6 +103,13 @@ class APRONState(State, metaclass=ABCMeta):
             return "⊥"
         return '{}'.format(self.state)
 
+    @copy_docstring(State.copy_shallow)
+    def copy_shallow(self) -> 'APRONState':
+        # only the APRON abstract element is modified, the environment is shared
+        state = copy(self)
+        state.state = deepcopy(self.state)
+        return state
+
     @copy_docstring(State.is_bottom)
     def is_bottom(self) -> bool:
         return self.state.is_bottom()
@@ -159,6 +198,19 @@ class APRONState(State, metaclass=ABCMeta):
             self._assume(condition.pop(), manager=manager, bwd=bwd)
             return self
 
+    def assume_box(self, ranges, manager: PyManager = None) -> 'APRONState':
+        """Assume that some variables are between given lower and upper bounds in the current state.
+
+        :param ranges: variables paired with their lower and upper bounds
+        :param manager: manager to be used for the assumption
+        :return: current state modified to satisfy the bounds (with a single APRON meet)
+        """
+        constraints = box2apron(ranges, self.environment)
+        if constraints:
+            abstract1 = self.domain(manager, self.environment, array=PyTcons1Array(constraints))
+            self.state = self.state.meet(abstract1)
+        return self
+
     @copy_docstring(State._substitute)
     def _substitute(self, left: Expression, right: Expression) -> 'APRONState':
         if isinstance(left, VariableIdentifier):
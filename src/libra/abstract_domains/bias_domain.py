@@ -17,6 +17,7 @@ from apronpy.polka import PyPolka
 from apronpy.tcons1 import PyTcons1Array, PyTcons1
 from apronpy.var import PyVar
 
+from libra.abstract_domains.apron_domain import box2apron
 from libra.abstract_domains.state import State
 from libra.core.expressions import VariableIdentifier, Expression, BinaryComparisonOperation, \
     BinaryBooleanOperation, Lyra2APRON, \
@@ -44,6 +45,16 @@ class BiasState(State):
         self.polka = PyPolka(manager, self.environment)
         # self.mirror = PyPolkaMPQstrict(self.environment)
 
+    def __deepcopy__(self, memo):
+        # only the APRON abstract element and the precursory state are copied, the environment is shared
+        state = self.__class__.__new__(self.__class__)
+        memo[id(self)] = state
+        state.__dict__.update(self.__dict__)
+        state.result = set(self.result)
+        state.precursory = deepcopy(self.precursory, memo)
+        state.polka = deepcopy(self.polka, memo)
+        return state
+
     @copy_docstring(State.bottom)
     def bottom(self, manager: PyManager = None):
         self.polka = PyPolka.bottom(manager, self.environment)
@@ -121,6 +132,20 @@ class BiasState(State):
             self._assume(condition.pop(), manager=manager, bwd=bwd)
             return self
 
+    def assume_box(self, ranges, manager: PyManager = None) -> 'BiasState':
+        """Assume that some variables are between given lower and upper bounds in the current state.
+
+        :param ranges: variables paired with their lower and upper bounds
+        :param manager: manager to be used for the assumption
+        :return: current state modified to satisfy the bounds (with a single APRON meet)
+        """
+        assert manager is not None
+        constraints = box2apron(ranges, self.environment)
+        if constraints:
+            abstract1 = PyPolka(manager, self.environment, array=PyTcons1Array(constraints))
+            self.polka = self.polka.meet(abstract1)
+        return self
+
     @copy_docstring(State._substitute)
     def _substitute(self, left: Expression, right: Expression) -> 'BiasState':
         if isinstance(left, VariableIdentifier):
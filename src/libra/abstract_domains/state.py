@@ -63,6 +63,13 @@ class State(Lattice, metaclass=ABCMeta):
     def __repr__(self):
         return ", ".join("{}".format(expression) for expression in self.result)
 
+    def copy_shallow(self) -> 'State':
+        """Copy of the current state that only duplicates what lattice operations and statements modify.
+
+        :return: a (by default, deep) copy of the current state
+        """
+        return deepcopy(self)
+
     @abstractmethod
     def _assign(self, left: Expression, right: Expression) -> 'State':
         """Assign an expression to another expression.
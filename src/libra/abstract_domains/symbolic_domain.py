@@ -15,6 +15,7 @@ from apronpy.var import PyVar
 from libra.abstract_domains.apron_domain import APRONState
 from libra.abstract_domains.state import State
 from libra.core.expressions import VariableIdentifier
+from libra.core.utils import copy_docstring
 
 
 class SymbolicState(APRONState):
@@ -32,6 +33,12 @@ class SymbolicState(APRONState):
         self.symbols: Dict[str, Tuple[PyVar, PyTexpr1]] = dict()
         self.flag = None
 
+    @copy_docstring(State.copy_shallow)
+    def copy_shallow(self) -> 'SymbolicState':
+        state = super().copy_shallow()
+        state.symbols = dict(self.symbols)     # the symbols are updated in place
+        return state
+
     @abstractmethod
     def affine(self, left: List[PyVar], right: List[PyTexpr1]) -> 'SymbolicState':
         """Affine layer.
@@ -23,7 +23,12 @@ from libra.core.utils import copy_docstring
 
 
 class Expression(metaclass=ABCMeta):
-    """Expression representation."""
+    """Expression representation.
+
+    .. note::
+        Expressions are immutable: they use slots (rather than a ``__dict__``) and cache their hash.
+    """
+    __slots__ = ()
 
     def __init__(self):
         """Expression construction."""
@@ -71,7 +76,10 @@ def _iter_child_exprs(expr: Expression):
     that is, all fields that are expressions
     and all items of fields that are lists of expressions.
     """
-    for _, field in expr.__dict__.items():
+    slots = (slot for cls in type(expr).__mro__ for slot in cls.__dict__.get('__slots__', ()))
+    fields = [getattr(expr, slot) for slot in slots if slot != '_hash']
+    fields.extend(getattr(expr, '__dict__', dict()).values())
+    for field in fields:
         if isinstance(field, Expression):
             yield field
         elif isinstance(field, list):
@@ -391,6 +399,7 @@ class Literal(Expression):
 
     https://docs.python.org/3.4/reference/expressions.html#literals
     """
+    __slots__ = ('_val', '_hash')
 
     def __init__(self, val: str):
         """Literal construction.
@@ -399,6 +408,7 @@ class Literal(Expression):
         """
         super().__init__()
         self._val = val
+        self._hash = None
 
     @property
     def val(self):
@@ -408,7 +418,12 @@ class Literal(Expression):
         return self.val == other.val
 
     def __hash__(self):
-        return hash(self.val)
+        if self._hash is None:
+            self._hash = hash(self.val)
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (self.val,)
 
     def __str__(self):
         return f"{self.val}"
@@ -419,6 +434,7 @@ class VariableIdentifier(Expression, metaclass=ABCMeta):
 
     https://docs.python.org/3.4/reference/expressions.html#atom-identifiers
     """
+    __slots__ = ('_name', '_hash')
 
     def __init__(self, name: str):
         """Identifier construction.
@@ -427,6 +443,7 @@ class VariableIdentifier(Expression, metaclass=ABCMeta):
         """
         super().__init__()
         self._name = name
+        self._hash = None
 
     @property
     def name(self):
@@ -436,7 +453,12 @@ class VariableIdentifier(Expression, metaclass=ABCMeta):
         return self.name == other.name
 
     def __hash__(self):
-        return hash(self.name)
+        if self._hash is None:
+            self._hash = hash(self.name)
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (self.name,)
 
     def __str__(self):
         return "{0.name}".format(self)
@@ -453,10 +475,12 @@ class Call(Expression, metaclass=ABCMeta):
 
     https://docs.python.org/3.4/reference/expressions.html#calls
     """
+    __slots__ = ()
 
 
 class Input(Call):
     """Input call representation."""
+    __slots__ = ()
 
     def __eq__(self, other: 'Input'):
         return True
@@ -475,6 +499,7 @@ Operation Expressions
 
 class Operation(Expression, metaclass=ABCMeta):
     """Operation representation."""
+    __slots__ = ()
 
 
 """
@@ -484,6 +509,8 @@ Unary Operation Expressions
 
 class UnaryOperation(Operation):
     """Unary operation representation."""
+    __slots__ = ('_operator', '_expression', '_hash')
+
     class Operator(IntEnum):
         """Unary operator representation."""
 
@@ -503,6 +530,7 @@ class UnaryOperation(Operation):
         super().__init__()
         self._operator = operator
         self._expression = expression
+        self._hash = None
 
     @property
     def operator(self):
@@ -518,7 +546,12 @@ class UnaryOperation(Operation):
         return operator and expression
 
     def __hash__(self):
-        return hash((self.operator, self.expression))
+        if self._hash is None:
+            self._hash = hash((self.operator, self.expression))
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (self.operator, self.expression)
 
     def __str__(self):
         expr_string = str(self.expression)
@@ -532,6 +565,7 @@ class UnaryArithmeticOperation(UnaryOperation):
 
     https://docs.python.org/3.4/reference/expressions.html#unary-arithmetic-and-bitwise-operations
     """
+    __slots__ = ()
 
     class Operator(UnaryOperation.Operator):
         """Unary arithmetic operator representation."""
@@ -558,6 +592,7 @@ class UnaryBooleanOperation(UnaryOperation):
 
     https://docs.python.org/3.4/reference/expressions.html#boolean-operations
     """
+    __slots__ = ()
 
     class Operator(UnaryOperation.Operator):
         """Unary boolean operator representation."""
@@ -583,6 +618,8 @@ Binary Operation Expressions
 
 class BinaryOperation(Operation):
     """Binary operation representation."""
+    __slots__ = ('_left', '_operator', '_right', '_hash')
+
     class Operator(IntEnum):
         """Binary operator representation."""
 
@@ -604,6 +641,7 @@ class BinaryOperation(Operation):
         self._left = left
         self._operator = operator
         self._right = right
+        self._hash = None
 
     @property
     def left(self):
@@ -624,7 +662,12 @@ class BinaryOperation(Operation):
         return left and operator and right
 
     def __hash__(self):
-        return hash((self.left, self.operator, self.right))
+        if self._hash is None:
+            self._hash = hash((self.left, self.operator, self.right))
+        return self._hash
+
+    def __reduce__(self):
+        return self.__class__, (self.left, self.operator, self.right)
 
     def __str__(self):
         left_string = str(self.left)
@@ -641,6 +684,7 @@ class BinaryArithmeticOperation(BinaryOperation):
 
     https://docs.python.org/3.4/reference/expressions.html#binary-arithmetic-operations
     """
+    __slots__ = ()
 
     class Operator(BinaryOperation.Operator):
         """Binary arithmetic operator representation."""
@@ -674,6 +718,7 @@ class BinaryBooleanOperation(BinaryOperation):
 
     https://docs.python.org/3.6/reference/expressions.html#boolean-operations
     """
+    __slots__ = ()
 
     class Operator(BinaryOperation.Operator):
         """Binary arithmetic operator representation."""
@@ -705,6 +750,7 @@ class BinaryComparisonOperation(BinaryOperation):
 
     https://docs.python.org/3.4/reference/expressions.html#comparisons
     """
+    __slots__ = ()
 
     class Operator(BinaryOperation.Operator):
         """Binary comparison operator representation"""
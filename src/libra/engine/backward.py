@@ -7,10 +7,12 @@ Backward Analysis Engine
 
 import itertools
 import operator
+import os
+import sys
 import time
 from copy import deepcopy
 from functools import reduce
-from multiprocessing import Value, Manager, Queue, Process, cpu_count, Lock
+from multiprocessing import Value, Queue, Process, cpu_count, get_context
 from typing import Tuple, Set, Dict, List, FrozenSet
 
 from apronpy.box import PyBoxMPQManager
@@ -28,7 +30,8 @@ from pip._vendor.colorama import Fore, Style, Back
 from libra.abstract_domains.bias_domain import BiasState
 from libra.abstract_domains.state import State
 from libra.core.cfg import Node, Function, Activation
-from libra.core.expressions import BinaryComparisonOperation, Literal, VariableIdentifier, BinaryBooleanOperation
+from libra.core.expressions import BinaryComparisonOperation, Literal, VariableIdentifier, BinaryBooleanOperation, \
+    Expression
 from libra.engine.interpreter import Interpreter
 from libra.semantics.backward import DefaultBackwardSemantics
 from libra.abstract_domains.interval2_domain import Box2State
@@ -42,8 +45,45 @@ rtype = TexprRtype.AP_RTYPE_REAL
 rdir = TexprRdir.AP_RDIR_RND
 OneHot1 = Tuple[VariableIdentifier, BinaryBooleanOperation]      # one-hot value for 1 feature
 OneHotN = Tuple[OneHot1, ...]                                    # one-hot values for n features
-lock = Lock()
 NON_APRON_DOMAINS = (Box2State, DeepPolyState, NeurifyState, Symbolic3State, ProductState)
+BATCH = 256                                                      # maximum number of 1-hot combinations per batch
+
+
+_tty = sys.stdout.isatty()      # whether the output goes to a terminal (and should thus be colored)
+
+
+def cprint(color: str, message: str):
+    """Print a message in a color, or without color codes if the output does not go to a terminal
+
+    :param color: color of the message
+    :param message: message to be printed
+    """
+    if _tty:
+        print(color + message, Style.RESET_ALL)
+    else:
+        print(message)
+
+
+def tty(code: str) -> str:
+    """Color code to be printed for a message spanning several lines
+
+    :param code: color (or reset) code
+    :return: the code, if the output goes to a terminal, or nothing otherwise
+    """
+    return code if _tty else ''
+
+
+def available_cpus() -> int:
+    """Default number of CPUs to be used for the analysis
+
+    Only counts the CPUs this process may run on (or those allocated by SLURM), and halves them to avoid running two
+    workers on the two hyper-threads of one physical core, unless LIBRA_FULL_CPU is set
+
+    :return: number of CPUs to be used for the analysis
+    """
+    cpu = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else cpu_count()
+    cpu = int(os.environ.get('SLURM_CPUS_ON_NODE', cpu))
+    return max(1, cpu if os.environ.get('LIBRA_FULL_CPU') else cpu // 2)
 
 
 def one_hots(variables: List[VariableIdentifier]) -> Set[OneHot1]:
@@ -56,32 +96,109 @@ def one_hots(variables: List[VariableIdentifier]) -> Set[OneHot1]:
     """
     values: Set[OneHot1] = set()
     arity = len(variables)
+    # build the clauses for each variable once and share them among all values
+    zero, one = Literal('0'), Literal('1')
+    lte, conj = BinaryComparisonOperation.Operator.LtE, BinaryBooleanOperation.Operator.And
+    zeros: List[BinaryBooleanOperation] = list()
+    ones: List[BinaryBooleanOperation] = list()
+    for variable in variables:
+        lower = BinaryComparisonOperation(zero, lte, variable)
+        upper = BinaryComparisonOperation(variable, lte, zero)
+        zeros.append(BinaryBooleanOperation(lower, conj, upper))
+        lower = BinaryComparisonOperation(one, lte, variable)
+        upper = BinaryComparisonOperation(variable, lte, one)
+        ones.append(BinaryBooleanOperation(lower, conj, upper))
     for i in range(arity):
         _value = dict()
         # the current variable has value one
-        one = Literal('1')
-        lower = BinaryComparisonOperation(one, BinaryComparisonOperation.Operator.LtE, variables[i])
-        upper = BinaryComparisonOperation(variables[i], BinaryComparisonOperation.Operator.LtE, one)
-        value = BinaryBooleanOperation(lower, BinaryBooleanOperation.Operator.And, upper)
+        value = ones[i]
         _value[variables[i]] = (1, 1)
         # everything else has value zero
-        zero = Literal('0')
         for j in range(0, i):
-            lower = BinaryComparisonOperation(zero, BinaryComparisonOperation.Operator.LtE, variables[j])
-            upper = BinaryComparisonOperation(variables[j], BinaryComparisonOperation.Operator.LtE, zero)
-            conj = BinaryBooleanOperation(lower, BinaryBooleanOperation.Operator.And, upper)
-            value = BinaryBooleanOperation(conj, BinaryBooleanOperation.Operator.And, value)
+            value = BinaryBooleanOperation(zeros[j], conj, value)
             _value[variables[j]] = (0, 0)
         for j in range(i + 1, arity):
-            lower = BinaryComparisonOperation(zero, BinaryComparisonOperation.Operator.LtE, variables[j])
-            upper = BinaryComparisonOperation(variables[j], BinaryComparisonOperation.Operator.LtE, zero)
-            conj = BinaryBooleanOperation(lower, BinaryBooleanOperation.Operator.And, upper)
-            value = BinaryBooleanOperation(value, BinaryBooleanOperation.Operator.And, conj)
+            value = BinaryBooleanOperation(value, conj, zeros[j])
             _value[variables[j]] = (0, 0)
         values.add((variables[i], value, tuple(_value.items())))
     return values
 
 
+def conjunction(clauses: List[Expression]) -> Expression:
+    """Balanced conjunction of a (non-empty) list of clauses
+
+    :param clauses: clauses to be conjoined
+    :return: conjunction of the clauses, as a tree of logarithmic (rather than linear) depth
+    """
+    conj = BinaryBooleanOperation.Operator.And
+    while len(clauses) > 1:
+        pairs = [BinaryBooleanOperation(left, conj, right) for left, right in zip(clauses[0::2], clauses[1::2])]
+        clauses = pairs + clauses[-1:] if len(clauses) % 2 else pairs
+    return clauses[0]
+
+
+def _sset(s) -> str:
+    """String representation of a set of nodes (for logging)"""
+    return '{{{}}}'.format(', '.join(map(str, s)))
+
+
+def _skey(key) -> str:
+    """String representation of an abstract activation pattern (for logging)"""
+    return ' | '.join('{}, {}'.format(_sset(active), _sset(inactive)) for active, inactive in key)
+
+
+_packing = None     # interpreter, entry state, manager, and last prefix of the current packing worker process
+
+
+def _init_packing(interpreter, entry):
+    """Initialize a packing worker process
+
+    :param interpreter: backward interpreter doing the packing
+    :param entry: state from which to start the (forward) analysis
+    """
+    global _packing
+    _packing = (interpreter, entry, PyBoxMPQManager(), list())
+
+
+def _classify_one_hot(one_hot: OneHotN):
+    """Determine the abstract activation pattern of a combination of one-hots (in a packing worker process)
+
+    :param one_hot: combination of one-hots for the one-hot encoded uncontroversial features
+    :return: the combination of one-hots paired with its abstract activation pattern
+    """
+    interpreter, entry, manager, prefix = _packing
+    return interpreter.consumer(one_hot, entry, manager, prefix=prefix)
+
+
+_analysis = None    # interpreter, patterns, manager, id, and color of the current analysis worker process
+
+
+def _init_analysis(interpreter, patterns, workers, colors):
+    """Initialize an analysis worker process
+
+    :param interpreter: backward interpreter doing the analysis
+    :param patterns: abstract activation patterns (with their corresponding chunks) to be analyzed
+    :param workers: number of analysis worker processes initialized so far (used to assign their ids)
+    :param colors: colors associated with the processes (for logging), one per process
+    """
+    global _analysis
+    with workers.get_lock():
+        id = workers.value
+        workers.value += 1
+    # the pool replaces worker processes that die, so the ids can exceed the number of colors
+    _analysis = (interpreter, patterns, PyPolkaMPQstrictManager(), id, colors[id % len(colors)])
+
+
+def _analyze_pattern(idx):
+    """Run the analysis for an abstract activation pattern (in an analysis worker process)
+
+    :param idx: index of the abstract activation pattern
+    :return: id of the worker process, number of analyzed partitions, and percent of the input space found to be biased
+    """
+    interpreter, patterns, manager, id, color = _analysis
+    return (id,) + interpreter.worker2(id, color, (idx + 1, patterns[idx]), manager, len(patterns))
+
+
 class BackwardInterpreter(Interpreter):
     """Backward control flow graph interpreter."""
 
@@ -96,17 +213,22 @@ class BackwardInterpreter(Interpreter):
         self.sensitive: List[VariableIdentifier] = None                 # sensitive feature
         self.values: List[OneHot1] = None                               # all one-hot sensitive values
         self.uncontroversial1: List[List[VariableIdentifier]] = None    # uncontroversial features / one-hot encoded
+        self.encoded: List[VariableIdentifier] = None                   # all one-hot encoded uncontroversial variables
         self.uncontroversial2: List[VariableIdentifier] = None          # uncontroversial features / custom encoded
+        self.r_uncontroversial2: Dict[VariableIdentifier, PyVar] = None  # APRON variables of the custom encoded uncontroversial features
         self.bounds: BinaryBooleanOperation = None      # bound between 0 and 1 of sensitive and one-hot encoded
 
         self.outputs: Set[VariableIdentifier] = None                    # output classes
+        self.outcomes: List[Tuple[VariableIdentifier, Expression]] = None      # output class conditions
 
         self.activations = None                                         # activation nodes
         self.active = None                                              # always active activations
         self.inactive = None                                            # always inactive activations
-        self.packs = Manager().dict()                                   # packing of 1-hot splits
+        self.predecessors: Dict[Node, Node] = None                     # predecessor of each node
+        self.packs = dict()                                             # packing of 1-hot splits
+        self.ranked = list()                                            # 1-hot split packs ranked by score
         self.count = 0                                                  # 1-hot split count
-        self.patterns = Manager().dict()                                # packing of abstract activation patterns
+        self.patterns = dict()                                          # packing of abstract activation patterns
         self.discarded = Value('i', 0)
         self.partitions = Value('i', 0)
 
@@ -125,7 +247,7 @@ class BackwardInterpreter(Interpreter):
         self.explored = Value('d', 0.0)                                 # percentage that was explored
         self.analyzed = Value('i', 0)                                   # analyzed patterns
 
-        self.cpu = cpu_count() if cpu is None else cpu
+        self.cpu = available_cpus() if cpu is None else cpu
 
     @property
     def initial(self):
@@ -135,6 +257,25 @@ class BackwardInterpreter(Interpreter):
         """
         return deepcopy(self._initial)
 
+    def fork_analyze(self, state, value, manager, **kwargs):
+        """Run the (forward) pre-analysis from a state restricted to a value of the sensitive feature
+
+        The pre-analysis already works on its own copy of the state, so (for APRON-based domains) the value is assumed
+        in place and the abstract element of the state is restored afterwards, instead of copying the state once more.
+
+        :param state: state to be restricted (left unchanged)
+        :param value: value of the sensitive feature
+        :param manager: manager to be used for the (forward) analysis
+        :param kwargs: further arguments of the (forward) analysis
+        :return: the result of the (forward) analysis
+        """
+        if isinstance(state, NON_APRON_DOMAINS):
+            return self.precursory.analyze(state.copy_shallow().assume(list(value[2])), **kwargs)
+        checkpoint = state.state    # the assumption rebinds the abstract element of the state
+        result = self.precursory.analyze(state.assume({value[1]}, manager=manager), **kwargs)
+        state.state = checkpoint
+        return result
+
     def feasibility(self, state, manager, disjuncts, key=None, chunk=None):
         """Determine feasibility (and activation patterns) for a partition of the input space
 
@@ -149,13 +290,9 @@ class BackwardInterpreter(Interpreter):
         outcomes = set()
         _disjunctions = None
         for idx, value in enumerate(self.values):
-            if isinstance(state, NON_APRON_DOMAINS):
-                result = deepcopy(state).assume(list(value[2]))
-            else:
-                result = deepcopy(state).assume({value[1]}, manager=manager)
             f_active = key[idx][0] if key else None
             f_inactive = key[idx][1] if key else None
-            active, inactive, outcome = self.precursory.analyze(result, forced_active=f_active, forced_inactive=f_inactive, outputs=self.outputs)
+            active, inactive, outcome = self.fork_analyze(state, value, manager, forced_active=f_active, forced_inactive=f_inactive, outputs=self.outputs)
             outcomes.add(outcome)
             disjunctions = len(self.activations) - len(active) - len(inactive)
             if disjunctions > disjuncts:
@@ -164,95 +301,83 @@ class BackwardInterpreter(Interpreter):
             patterns.append((value, frozenset(active), frozenset(inactive)))
         if len(outcomes) <= 1 and None not in outcomes:
             classes = ', '.join(str(outcome) for outcome in outcomes)
-            print(Fore.GREEN + '✔︎ No Bias ({}) in {}'.format(classes, chunk), Style.RESET_ALL)
+            cprint(Fore.GREEN, '✔︎ No Bias ({}) in {}'.format(classes, chunk))
             return True, list(), len(self.activations)
         return feasible, patterns, _disjunctions
 
-    def producer(self, queue3):
-        """Produce all possible combinations of one-hots for the one-hot encoded uncontroversial features
-
-        :param queue3: queue in which to put the combinations
-        """
-        one_hotn = itertools.product(*(one_hots(encoding) for encoding in self.uncontroversial1))
-        for one_hot in one_hotn:
-            queue3.put(one_hot)
-        queue3.put(None)
-
-    def consumer(self, queue3, entry, manager):
-        """Consume a combination of one-hots and put it in its abstract activation pattern pack
+    def consumer(self, one_hot, entry, manager, prefix=None):
+        """Determine the abstract activation pattern of a combination of one-hots
 
-        :param queue3: queue from which to get the combination
+        :param one_hot: combination of one-hots for the one-hot encoded uncontroversial features
         :param entry: state from which to start the (forward) analysis
         :param manager: manager to be used for the analysis
+        :param prefix: states obtained for the previously consumed combination (updated in place)
+        :return: the combination of one-hots paired with its abstract activation pattern
         """
-        while True:
-            one_hot = queue3.get(block=True)
-            if one_hot is None:
-                queue3.put(None)
-                break
-            result1 = deepcopy(entry)
-            for item in one_hot:
-                if isinstance(entry, NON_APRON_DOMAINS):
-                    result1 = result1.assume(list(item[2]))
-                else:
-                    result1 = result1.assume({item[1]}, manager=manager)
-            key = list()
-            for value in self.values:
-                if isinstance(entry, NON_APRON_DOMAINS):
-                    result2 = deepcopy(result1).assume(list(value[2]))
-                else:
-                    result2 = deepcopy(result1).assume({value[1]}, manager=manager)
-                active, inactive, _ = self.precursory.analyze(result2, earlystop=False, outputs=self.outputs)
-                key.append((frozenset(active), frozenset(inactive)))
-            _key = tuple(key)
-            lock.acquire()
-            curr = self.packs.get(_key, set())
-            curr.add(one_hot)
-            self.packs[_key] = curr
-            lock.release()
+        prefix = list() if prefix is None else prefix
+        # reuse the states of the longest prefix shared with the previously consumed combination
+        shared = 0
+        while shared < len(prefix) and prefix[shared][0] == one_hot[shared][0]:
+            shared += 1
+        del prefix[shared:]
+        result1 = prefix[-1][1] if prefix else entry
+        for item in one_hot[shared:]:
+            if isinstance(entry, NON_APRON_DOMAINS):
+                result1 = result1.copy_shallow().assume(list(item[2]))
+            else:
+                result1 = result1.copy_shallow().assume({item[1]}, manager=manager)
+            prefix.append((item[0], result1))
+        key = list()
+        for value in self.values:
+            active, inactive, _ = self.fork_analyze(result1, value, manager, earlystop=False, outputs=self.outputs)
+            key.append((frozenset(active), frozenset(inactive)))
+        return one_hot, tuple(key)
 
     def packing(self, entry):
         """Pack all combinations of one-hots into abstract activation pattern packs
 
         :param entry: state from which to start the (forward) analysis
         """
-        queue3 = Queue()
         start3 = time.time()
-        processes = list()
-        process = Process(target=self.producer, args=(queue3,))
-        processes.append(process)
-        for _ in range(self.cpu - 1):
-            process = Process(target=self.consumer, args=(queue3, entry, PyBoxMPQManager()))
-            processes.append(process)
-        for process in processes:
-            process.start()
-        for process in processes:
-            process.join()
+        one_hotn = itertools.product(*(one_hots(encoding) for encoding in self.uncontroversial1))
+        packs: Dict[Tuple[Tuple[FrozenSet[Node], FrozenSet[Node]], ...], Set[OneHotN]] = dict()
+        workers = max(1, self.cpu - 1)
+        # batch the combinations sent to each worker, but leave a few batches per worker for load balancing
+        batch = max(1, min(BATCH, self.count // (4 * workers)))
+        # the (APRON) entry state cannot be pickled and is inherited by forking the worker processes
+        with get_context('fork').Pool(workers, initializer=_init_packing, initargs=(self, entry)) as pool:
+            for one_hot, _key in pool.imap_unordered(_classify_one_hot, one_hotn, chunksize=batch):
+                packs.setdefault(_key, set()).add(one_hot)
+        self.packs = packs
         end3 = time.time()
         _count = sum(len(pack) for pack in self.packs.values())
         assert self.count == _count
-        print(Fore.YELLOW + '\nFound {} Packs for {} 1-Hot Combinations:'.format(len(self.packs), _count))
+        cprint(Fore.YELLOW, '\nFound {} Packs for {} 1-Hot Combinations:'.format(len(self.packs), _count))
         score = lambda k: sum(len(s[0]) + len(s[1]) for s in k)
-        for key, pack in sorted(self.packs.items(), key=lambda v: score(v[0]) + len(v[1]), reverse=True):
-            sset = lambda s: '{{{}}}'.format(', '.join('{}'.format(e) for e in s))
-            skey = ' | '.join('{}, {}'.format(sset(pair[0]), sset(pair[1])) for pair in key)
-            sscore = '(score: {})'.format(score(key) + len(pack))
+        ranked = [(score(key) + len(pack), key, pack) for key, pack in self.packs.items()]
+        self.ranked = sorted(ranked, key=lambda v: v[0], reverse=True)
+        for rank, key, pack in self.ranked:
+            skey = _skey(key)
+            sscore = '(score: {})'.format(rank)
             spack = ' | '.join('{}'.format(','.join('{}'.format(item[0]) for item in one_hot)) for one_hot in pack)
-            print(Fore.YELLOW, skey, '->', spack, sscore, Style.RESET_ALL)
-        print(Fore.YELLOW + '1-Hot Splitting Time: {}s\n'.format(end3 - start3), Style.RESET_ALL)
+            cprint(Fore.YELLOW, '{} -> {} {}'.format(skey, spack, sscore))
+        cprint(Fore.YELLOW, '1-Hot Splitting Time: {}s\n'.format(end3 - start3))
 
-    def worker1(self, id, color, queue1, manager):
+    def worker1(self, id, color, queue1, manager, results):
         """Partition the analysis into feasible chunks and pack them into abstract activation pattern packs
 
         :param id: id of the process
         :param color: color associated with the process (for logging)
         :param queue1: queue from which to get the current chunk
         :param manager: manager to be used for the (forward) analysis
+        :param results: queue in which to put the abstract activation pattern packs found by the process
         """
+        packed = dict()
         while True:
             assumptions, steps, size, disjuncts, pivot1, unpacked, ranges, pivot2, splittable, percent, key = queue1.get(block=True)
             if assumptions is None:     # no more chunks
                 queue1.put((None, None, None, None, None, None, None, None, None, None, None))
+                results.put(packed)
                 break
             r_assumptions = '1-Hot: {}'.format(
                 ', '.join('{}'.format('|'.join('{}'.format(var) for var in case)) for (case, _, _) in assumptions)
@@ -261,18 +386,13 @@ class BackwardInterpreter(Interpreter):
                 ', '.join('{} ∈ [{}, {}]'.format(feature, lower, upper) for feature, (lower, upper) in ranges)
             )
             r_partition = '{} | {}'.format(r_assumptions, r_ranges) if r_assumptions else '{}'.format(r_ranges)
-            print(color + r_partition, Style.RESET_ALL)
+            cprint(color, r_partition)
             # bound the custom encoded uncontroversial features between their current lower and upper bounds
-            bounds = self.bounds
-            for feature, (lower, upper) in ranges:
-                left = BinaryComparisonOperation(Literal(str(lower)), BinaryComparisonOperation.Operator.LtE, feature)
-                right = BinaryComparisonOperation(feature, BinaryComparisonOperation.Operator.LtE, Literal(str(upper)))
-                conj = BinaryBooleanOperation(left, BinaryBooleanOperation.Operator.And, right)
-                bounds = BinaryBooleanOperation(bounds, BinaryBooleanOperation.Operator.And, conj)
-            if isinstance(self.initial.precursory, NON_APRON_DOMAINS):
-                entry = self.initial.precursory.assume(ranges)
+            if isinstance(self._initial.precursory, NON_APRON_DOMAINS):
+                entry = self._initial.precursory.copy_shallow().assume(ranges)
             else:
-                entry = self.initial.precursory.assume({bounds}, manager=manager)
+                entry = self._initial.precursory.copy_shallow().assume({self.bounds}, manager=manager)
+                entry = entry.assume_box(ranges, manager=manager)
             # take into account the accumulated assumptions on the one-hot encoded uncontroversial features
             for (_, assumption, _assumption) in assumptions:
                 if isinstance(entry, NON_APRON_DOMAINS):
@@ -299,20 +419,16 @@ class BackwardInterpreter(Interpreter):
                         key.append((frozenset(active), frozenset(inactive)))
                     _key = tuple(key)
                     value = (frozenset(assumptions), frozenset(unpacked), frozenset(ranges), percent)
-                    lock.acquire()
-                    curr = self.patterns.get(_key, set())
-                    curr.add(value)
-                    self.patterns[_key] = curr
-                    lock.release()
+                    packed.setdefault(_key, set()).add(value)
                     found = '‼ Possible Bias in {}'.format(r_partition)
-                    print(Fore.LIGHTYELLOW_EX + found, Style.RESET_ALL)
+                    cprint(Fore.LIGHTYELLOW_EX, found)
                 else:
                     with self.discarded.get_lock():
                         self.discarded.value += 1
                     with self.fair.get_lock():
                         self.fair.value += percent
                 progress = 'Progress for #{}: {}% of {}% ({}% fair)'.format(id, self.feasible.value, self.explored.value, self.fair.value)
-                print(Fore.YELLOW + progress, Style.RESET_ALL)
+                cprint(Fore.YELLOW, progress)
             else:  # too many disjunctions, we need to split further
                 print('Too many disjunctions ({})!'.format(feasibility[2]))
                 if pivot1 < len(self.uncontroversial1):  # we still have to split the one-hot encoded
@@ -322,8 +438,8 @@ class BackwardInterpreter(Interpreter):
                     ))
                     self.packing(entry)     # pack the one-hot combinations
                     # run the analysis on the ranked packs
-                    score = lambda k: sum(len(s[0]) + len(s[1]) for s in k)
-                    for key, pack in sorted(self.packs.items(), key=lambda v: score(v[0]) + len(v[1]), reverse=True):
+                    disj = BinaryBooleanOperation.Operator.Or
+                    for _, key, pack in self.ranked:
                         _assumptions = list(assumptions)
                         items: List[OneHotN] = list(pack)  # multiple one-hot values for n features
                         for i in range(len(items[0])):  # for each feature...
@@ -333,13 +449,13 @@ class BackwardInterpreter(Interpreter):
                             for item in items[1:]:
                                 var, nxt, _nxt = item[i]
                                 variables.add(var)
-                                case = BinaryBooleanOperation(case, BinaryBooleanOperation.Operator.Or, nxt)
-                                _case = BinaryBooleanOperation(_case, BinaryBooleanOperation.Operator.Or, _nxt)
+                                case = BinaryBooleanOperation(case, disj, nxt)
+                                _case = BinaryBooleanOperation(_case, disj, _nxt)
                             _assumptions.append((frozenset(variables), case, _case))
                         _unpacked = frozenset(frozenset(item) for item in pack)
                         _pivot1 = len(self.uncontroversial1)
                         _percent = percent * len(pack) / self.count
-                        queue1.put((_assumptions, steps, size, disjuncts, _pivot1, _unpacked, ranges, pivot2, splittable, _percent, key))
+                        queue1.put((tuple(_assumptions), steps, size, disjuncts, _pivot1, _unpacked, ranges, pivot2, splittable, _percent, key))
                 else:  # we can split the rest
                     if size == 0 and len(unpacked) > 1:  # unpack one-hots first if difference = 0
                         _percent = percent / len(unpacked)
@@ -356,21 +472,18 @@ class BackwardInterpreter(Interpreter):
                         (lower, upper) = rangesdict[self.uncontroversial2[pivot2]]
                         if upper - lower <= size:
                             print('Cannot range split for {} anymore!'.format(self.uncontroversial2[pivot2]))
-                            _splittable = list(splittable)
-                            _splittable.remove(self.uncontroversial2[pivot2])
+                            _splittable = tuple(var for var in splittable if var != self.uncontroversial2[pivot2])
                             _pivot2 = (pivot2 + 1) % len(self.uncontroversial2)
-                            _splittable = list(_splittable)
                             queue1.put((assumptions, steps, size, disjuncts, pivot1, unpacked, ranges, _pivot2, _splittable, percent, None))
                         else:
                             middle = lower + (upper - lower) / 2
                             print('Range split for {} at: {}'.format(self.uncontroversial2[pivot2], middle))
-                            left = deepcopy(rangesdict)
-                            left[self.uncontroversial2[pivot2]] = (lower, middle)
-                            right = deepcopy(rangesdict)
-                            right[self.uncontroversial2[pivot2]] = (middle, upper)
+                            # the ranges are immutable tuples, no need to copy them
+                            left = {**rangesdict, self.uncontroversial2[pivot2]: (lower, middle)}
+                            right = {**rangesdict, self.uncontroversial2[pivot2]: (middle, upper)}
                             _pivot2 = (pivot2 + 1) % len(self.uncontroversial2)
                             _percent = percent / 2
-                            _left, _right = list(left.items()), list(right.items())
+                            _left, _right = tuple(left.items()), tuple(right.items())
                             queue1.put((assumptions, steps, size, disjuncts, pivot1, unpacked, _left, _pivot2, splittable, _percent, None))
                             queue1.put((assumptions, steps, size, disjuncts, pivot1, unpacked, _right, _pivot2, splittable, _percent, None))
                     elif len(unpacked) > 1:     # last resort: unpack the one-hot combinations
@@ -389,32 +502,32 @@ class BackwardInterpreter(Interpreter):
                             _stepsL, _stepsU = 0 if stepsU + 1 <= self.steps[1] else stepsL, stepsU + 1
                             _size, _pivot2, _splittable = size, pivot2, splittable
                             _disjuncts = disjuncts + 1
-                            print(Fore.BLUE + "Upper bound increase from: {} to: {}".format(disjuncts, _disjuncts), Style.RESET_ALL)
+                            cprint(Fore.BLUE, "Upper bound increase from: {} to: {}".format(disjuncts, _disjuncts))
                         elif stepsU < self.steps[1] and 2 * self.minL <= size:
                             _stepsL, _stepsU = stepsL, stepsU
-                            _size, _pivot2, _splittable = size / 2, 0, list(self.uncontroversial2)
+                            _size, _pivot2, _splittable = size / 2, 0, tuple(self.uncontroversial2)
                             _disjuncts = disjuncts
-                            print(Fore.BLUE + "Lower bound decrease from: {} to: {}".format(size, _size), Style.RESET_ALL)
+                            cprint(Fore.BLUE, "Lower bound decrease from: {} to: {}".format(size, _size))
                         elif stepsL < self.steps[0] and 2 * self.minL <= size:
                             _stepsL, _stepsU = stepsL + 1, 0 if stepsL + 1 <= self.steps[0] else stepsU
-                            _size, _pivot2, _splittable = size / 2, 0, list(self.uncontroversial2)
+                            _size, _pivot2, _splittable = size / 2, 0, tuple(self.uncontroversial2)
                             _disjuncts = disjuncts
-                            print(Fore.BLUE + "Lower bound decrease from: {} to: {}".format(size, _size), Style.RESET_ALL)
+                            cprint(Fore.BLUE, "Lower bound decrease from: {} to: {}".format(size, _size))
                         elif stepsL < self.steps[0] and disjuncts < self.maxU:
                             _stepsL, _stepsU = stepsL, stepsU
                             _size, _pivot2, _splittable = size, pivot2, splittable
                             _disjuncts = disjuncts + 1
-                            print(Fore.BLUE + "Upper bound increase from: {} to: {}".format(disjuncts, _disjuncts), Style.RESET_ALL)
+                            cprint(Fore.BLUE, "Upper bound increase from: {} to: {}".format(disjuncts, _disjuncts))
                         elif stepsL == self.steps[0] and stepsU == self.steps[1]:
                             _stepsL, _stepsU = stepsL, stepsU
                             if 2 * self.minL <= size:
-                                _size, _pivot2, _splittable = size / 2, 0, list(self.uncontroversial2)
-                                print(Fore.BLUE + "Lower bound decrease from: {} to: {}".format(size, _size), Style.RESET_ALL)
+                                _size, _pivot2, _splittable = size / 2, 0, tuple(self.uncontroversial2)
+                                cprint(Fore.BLUE, "Lower bound decrease from: {} to: {}".format(size, _size))
                             else:
                                 _size, _pivot2, _splittable = size, pivot2, splittable
                             if disjuncts < self.maxU:
                                 _disjuncts = disjuncts + 1
-                                print(Fore.BLUE + "Upper bound increase from: {} to: {}".format(disjuncts, _disjuncts), Style.RESET_ALL)
+                                cprint(Fore.BLUE, "Upper bound increase from: {} to: {}".format(disjuncts, _disjuncts))
                             else:
                                 _disjuncts = disjuncts
                         else:
@@ -425,7 +538,7 @@ class BackwardInterpreter(Interpreter):
                             self.lower.value = min(self.lower.value, _size)
                         with self.upper.get_lock():
                             self.upper.value = max(self.upper.value, _disjuncts)
-                        print(Fore.BLUE + "Autotuned to: L = {}, U = {}".format(_size, _disjuncts), Style.RESET_ALL)
+                        cprint(Fore.BLUE, "Autotuned to: L = {}, U = {}".format(_size, _disjuncts))
                         queue1.put((assumptions, (_stepsL, _stepsU), _size, _disjuncts, pivot1, unpacked, ranges, _pivot2, _splittable, percent, key))
                     else:
                         with self.explored.get_lock():
@@ -433,9 +546,9 @@ class BackwardInterpreter(Interpreter):
                             if self.explored.value >= 100:
                                 queue1.put((None, None, None, None, None, None, None, None, None, None, None))
                         found = '‼ Unchecked Bias in {}'.format(r_partition)
-                        print(Fore.RED + found, Style.RESET_ALL)
+                        cprint(Fore.RED, found)
                         progress = 'Progress for #{}: {}% of {}% ({}% fair)'.format(id, self.feasible.value, self.explored.value, self.fair.value)
-                        print(Fore.YELLOW + progress, Style.RESET_ALL)
+                        cprint(Fore.YELLOW, progress)
 
     def bias_check(self, chunk, result, ranges, percent):
         """Check for algorithmic bias
@@ -444,64 +557,69 @@ class BackwardInterpreter(Interpreter):
         :param result: result of the (backward) analysis for the current abstract activation pattern
         :param ranges: ranges for the custom encoded uncontroversial features in the chunk
         :param percent: percent of the input space covered by the chunk
+        :return: percent of the input space found to be biased in the chunk
         """
         nobias = True
         biases = set()
         b_ranges = dict()
         items = list(result.items())
-        for i in range(len(items)):
+        by_outcome: Dict[VariableIdentifier, List[int]] = dict()
+        for i, ((outcome, _), _) in enumerate(items):
+            by_outcome.setdefault(outcome, list()).append(i)
+        # only pairs with different outcomes for different sensitive values can witness a bias
+        # (the pairs are kept in the order and orientation of the items, like the reported biases)
+        pairs = sorted(
+            (min(i, j), max(i, j))
+            for outcome1, outcome2 in itertools.combinations(by_outcome, 2)
+            for i in by_outcome[outcome1]
+            for j in by_outcome[outcome2] if items[i][0][1] != items[j][0][1]
+        )
+        for i, j in pairs:
             (outcome1, sensitive1), value1 = items[i]
-            for j in range(i+1, len(items)):
-                (outcome2, sensitive2), value2 = items[j]
-                if outcome1 != outcome2 and sensitive1 != sensitive2:
-                    for val1 in value1:
-                        for val2 in value2:
-                            intersection = deepcopy(val1).meet(val2)
-                            for encoding in self.uncontroversial1:
-                                intersection = intersection.forget(encoding)
-                            for feature, (lower, upper) in ranges:
-                                lte = BinaryComparisonOperation.Operator.LtE
-                                left = BinaryComparisonOperation(Literal(str(lower)), lte, feature)
-                                right = BinaryComparisonOperation(feature, lte, Literal(str(upper)))
-                                conj = BinaryBooleanOperation(left, BinaryBooleanOperation.Operator.And, right)
-                                intersection = intersection.assume({conj}, manager=self.manager)
-                            # for assumption in assumptions0:
-                            #     intersection = intersection.assume(assumption)
-                            representation = repr(intersection.polka)
-                            if not representation.startswith('-1.0 >= 0') and not representation == '⊥':
-                                nobias = False
-                                if representation not in biases:
-                                    for uncontroversial in self.uncontroversial2:
-                                        itv: Interval = intersection.polka.bound_variable(PyVar(uncontroversial.name))
-                                        lower = eval(str(itv.interval.contents.inf.contents))
-                                        upper = eval(str(itv.interval.contents.sup.contents))
-                                        if uncontroversial in b_ranges:
-                                            inf, sup = b_ranges[uncontroversial]
-                                            b_ranges[uncontroversial] = (min(lower, inf), max(upper, sup))
-                                        else:
-                                            b_ranges[uncontroversial] = (lower, upper)
-                                    biases.add(representation)
-                                    pair = '{}->{} vs {}->{}'.format(sensitive1, outcome1, sensitive2, outcome2)
-                                    found = '✘ Bias Found ({})! in {}:\n{}'.format(pair, chunk, representation)
-                                    print(Fore.RED + found, Style.RESET_ALL)
+            (outcome2, sensitive2), value2 = items[j]
+            for val1 in value1:
+                for val2 in value2:
+                    intersection = deepcopy(val1).meet(val2)
+                    if self.encoded:
+                        intersection = intersection.forget(self.encoded)
+                    intersection = intersection.assume_box(ranges, manager=self.manager)
+                    # for assumption in assumptions0:
+                    #     intersection = intersection.assume(assumption)
+                    if intersection.is_bottom():    # no need to render the polyhedron
+                        continue
+                    representation = repr(intersection.polka)
+                    if not representation.startswith('-1.0 >= 0') and not representation == '⊥':
+                        nobias = False
+                        if representation not in biases:
+                            for uncontroversial, r_uncontroversial in self.r_uncontroversial2.items():
+                                itv: Interval = intersection.polka.bound_variable(r_uncontroversial)
+                                lower = eval(str(itv.interval.contents.inf.contents))
+                                upper = eval(str(itv.interval.contents.sup.contents))
+                                if uncontroversial in b_ranges:
+                                    inf, sup = b_ranges[uncontroversial]
+                                    b_ranges[uncontroversial] = (min(lower, inf), max(upper, sup))
+                                else:
+                                    b_ranges[uncontroversial] = (lower, upper)
+                            biases.add(representation)
+                            pair = '{}->{} vs {}->{}'.format(sensitive1, outcome1, sensitive2, outcome2)
+                            found = '✘ Bias Found ({})! in {}:\n{}'.format(pair, chunk, representation)
+                            cprint(Fore.RED, found)
         if nobias:
             outcomes = set()
             for i in range(len(items)):
                 (outcome, sensitive), value = items[i]
                 for val in value:
-                    for encoding in self.uncontroversial1:
-                        val = val.forget(encoding)
-                    for feature, (lower, upper) in ranges:
-                        lte = BinaryComparisonOperation.Operator.LtE
-                        left = BinaryComparisonOperation(Literal(str(lower)), lte, feature)
-                        right = BinaryComparisonOperation(feature, lte, Literal(str(upper)))
-                        conj = BinaryBooleanOperation(left, BinaryBooleanOperation.Operator.And, right)
-                        val = val.assume({conj}, manager=self.manager)
-                        representation = repr(val.polka)
-                        if not representation.startswith('-1.0 >= 0') and not representation == '⊥':
-                            outcomes.add(outcome)
+                    if self.encoded:
+                        val = val.forget(self.encoded)
+                    val = val.assume_box(ranges, manager=self.manager)
+                    if val.is_bottom():     # no need to render the polyhedron
+                        continue
+                    representation = repr(val.polka)
+                    if not representation.startswith('-1.0 >= 0') and not representation == '⊥':
+                        outcomes.add(outcome)
             classes = ', '.join(str(outcome) for outcome in outcomes)
-            print(Fore.GREEN + '✔︎ No Bias ({}) in {}'.format(classes, chunk), Style.RESET_ALL)
+            cprint(Fore.GREEN, '✔︎ No Bias ({}) in {}'.format(classes, chunk))
+            return 0
         else:
             total_size = 1
             for _, (lower, upper) in ranges:
@@ -509,9 +627,7 @@ class BackwardInterpreter(Interpreter):
             biased_size = 1
             for (lower, upper) in b_ranges.values():
                 biased_size *= upper - lower
-            _percent = percent * biased_size / total_size
-            with self.biased.get_lock():
-                self.biased.value += _percent
+            return percent * biased_size / total_size
 
     def from_node(self, node, initial, join):
         """Run the backward analysis
@@ -521,131 +637,98 @@ class BackwardInterpreter(Interpreter):
         :param join: whether joins should be performed
         :return: the result of the (backward) analysis (at the beginning of the CFG)
         """
-        state = initial
-        if isinstance(node, Function):
-            state = self.semantics.list_semantics(node.stmts, state)
-            if state.is_bottom():
+        worklist = [(node, initial)]    # paths still to be explored (None for an unfeasible path)
+        while worklist:
+            node, state = worklist.pop()
+            if node is None:
                 yield None
+                continue
+            if isinstance(node, Function):
+                state = self.semantics.list_semantics(node.stmts, state)
+            elif isinstance(node, Activation):
+                if node in self.active:  # only the active path is viable
+                    state = self.semantics.ReLU_call_semantics(node.stmts, state, self.manager, True)
+                elif node in self.inactive:  # only the inactive path is viable
+                    state = self.semantics.ReLU_call_semantics(node.stmts, state, self.manager, False)
+                else:  # both paths are viable
+                    inactive = deepcopy(state)
+                    state1 = self.semantics.ReLU_call_semantics(node.stmts, state, self.manager, True)
+                    state2 = self.semantics.ReLU_call_semantics(node.stmts, inactive, self.manager, False)
+                    predecessor = self.predecessors[node]
+                    if join:
+                        worklist.append((predecessor, state1.join(state2)))
+                    elif state1.is_bottom():
+                        worklist.append((None, None) if state2.is_bottom() else (predecessor, state2))
+                    else:   # explore the active path first
+                        worklist.append((None, None) if state2.is_bottom() else (predecessor, state2))
+                        worklist.append((predecessor, state1))
+                    continue
             else:
-                if self.cfg.predecessors(node):
-                    yield from self.from_node(self.cfg.nodes[self.cfg.predecessors(node).pop()], state, join)
-                else:
-                    yield state
-        elif isinstance(node, Activation):
-            if node in self.active:  # only the active path is viable
-                state = self.semantics.ReLU_call_semantics(node.stmts, state, self.manager, True)
-                if state.is_bottom():
-                    yield None
-                else:
-                    predecessor = self.cfg.nodes[self.cfg.predecessors(node).pop()]
-                    yield from self.from_node(predecessor, state, join)
-            elif node in self.inactive:  # only the inactive path is viable
-                state = self.semantics.ReLU_call_semantics(node.stmts, state, self.manager, False)
-                if state.is_bottom():
-                    yield None
-                else:
-                    predecessor = self.cfg.nodes[self.cfg.predecessors(node).pop()]
-                    yield from self.from_node(predecessor, state, join)
-            else:  # both paths are viable
-                active, inactive = deepcopy(state), deepcopy(state)
-                state1 = self.semantics.ReLU_call_semantics(node.stmts, active, self.manager, True)
-                state2 = self.semantics.ReLU_call_semantics(node.stmts, inactive, self.manager, False)
-                if join:
-                    state = state1.join(state2)
-                    predecessor = self.cfg.nodes[self.cfg.predecessors(node).pop()]
-                    yield from self.from_node(predecessor, state, join)
-                else:
-                    if state1.is_bottom():
-                        if state2.is_bottom():
-                            yield None
-                        else:
-                            predecessor = self.cfg.nodes[self.cfg.predecessors(node).pop()]
-                            yield from self.from_node(predecessor, state2, join)
-                    else:
-                        predecessor = self.cfg.nodes[self.cfg.predecessors(node).pop()]
-                        yield from self.from_node(predecessor, state1, join)
-                        if state2.is_bottom():
-                            yield None
-                        else:
-                            yield from self.from_node(predecessor, state2, join)
-        else:
-            for stmt in reversed(node.stmts):
-                state = self.semantics.assume_call_semantics(stmt, state, self.manager)
+                for stmt in reversed(node.stmts):
+                    state = self.semantics.assume_call_semantics(stmt, state, self.manager)
             if state.is_bottom():
                 yield None
+            elif node in self.predecessors:
+                worklist.append((self.predecessors[node], state))
             else:
-                if self.cfg.predecessors(node):
-                    yield from self.from_node(self.cfg.nodes[self.cfg.predecessors(node).pop()], state, join)
-                else:
-                    yield state
+                yield state
 
-    def worker2(self, id, color, queue2, manager, total):
+    def worker2(self, id, color, pattern, manager, total):
         """Run the analysis for an abstract activation pattern and check the corresponding chunks for algorithmic bias
 
         :param id: id of the process
         :param color: color associated with the process (for logging)
-        :param queue2: queue from which to get the current abstract activation pattern and corresponding chunks
+        :param pattern: index of the abstract activation pattern, together with the pattern and corresponding chunks
         :param manager: manager to be used for the (backward) analysis
         :param total: total number of abstract activation patterns
+        :return: number of analyzed partitions, and percent of the input space found to be biased
         """
-        while True:
-            idx, (key, pack) = queue2.get(block=True)
-            if idx is None:     # no more abstract activation patterns
-                queue2.put((None, (None, None)))
-                break
-            print(color + 'Pattern #{} of {} [{}]'.format(idx, total, len(pack)), Style.RESET_ALL)
-            check: Dict[Tuple[VariableIdentifier, VariableIdentifier], Set[BiasState]] = dict()
-            for idx, (case, value, _) in enumerate(self.values):
-                self.active, self.inactive = key[idx]
-                for chosen in self.outputs:
-                    remaining = self.outputs - {chosen}
-                    discarded = remaining.pop()
-                    outcome = BinaryComparisonOperation(discarded, BinaryComparisonOperation.Operator.Lt, chosen)
-                    for discarded in remaining:
-                        cond = BinaryComparisonOperation(discarded, BinaryComparisonOperation.Operator.Lt, chosen)
-                        outcome = BinaryBooleanOperation(outcome, BinaryBooleanOperation.Operator.And, cond)
-                    result = self.initial.assume({outcome}, manager=manager, bwd=True)
-                    check[(chosen, case)] = set()
-                    for state in self.from_node(self.cfg.out_node, deepcopy(result), False):
-                        if state:
-                            state = state.assume({value}, manager=manager)
-                            check[(chosen, case)].add(state)
-            # check for bias
-            for assumptions, unpacked, ranges, percent in pack:
-                r_assumptions = '1-Hot: {}'.format(
-                    ', '.join('{}'.format('|'.join('{}'.format(var) for var in case)) for (case, _, _) in assumptions)
-                ) if assumptions else ''
-                r_ranges = 'Ranges: {}'.format(
-                    ', '.join('{} ∈ [{}, {}]'.format(feature, lower, upper) for feature, (lower, upper) in ranges)
-                )
-                r_partition = '{} | {}'.format(r_assumptions, r_ranges) if r_assumptions else '{}'.format(r_ranges)
-                if unpacked:
-                    _percent = percent / len(unpacked)
-                    for item in unpacked:
-                        partition = deepcopy(check)
-                        for states in partition.values():
-                            for state in states:
-                                for (_, assumption, _) in item:
-                                    state.assume({assumption}, manager=manager)
-                                # forget the sensitive variables
-                                state.forget(self.sensitive)
-                        self.bias_check(r_partition, partition, ranges, _percent)
-                else:
-                    partition = deepcopy(check)
-                    for states in partition.values():
+        idx, (key, pack) = pattern
+        cprint(color, 'Pattern #{} of {} [{}]'.format(idx, total, len(pack)))
+        check: Dict[Tuple[VariableIdentifier, VariableIdentifier], Set[BiasState]] = dict()
+        for idx, (case, value, _) in enumerate(self.values):
+            self.active, self.inactive = key[idx]
+            for chosen, outcome in self.outcomes:
+                result = self.initial.assume({outcome}, manager=manager, bwd=True)
+                check[(chosen, case)] = set()
+                for state in self.from_node(self.cfg.out_node, result, False):
+                    if state:
+                        state = state.assume({value}, manager=manager)
+                        check[(chosen, case)].add(state)
+        # check for bias
+        # the operations on the states always build new APRON abstract elements (instead of modifying them),
+        # thus restoring the states only requires to reinstate their abstract elements (without any copy)
+        checkpoint = [(state, state.polka) for states in check.values() for state in states]
+        biased = 0
+        for assumptions, unpacked, ranges, percent in pack:
+            r_assumptions = '1-Hot: {}'.format(
+                ', '.join('{}'.format('|'.join('{}'.format(var) for var in case)) for (case, _, _) in assumptions)
+            ) if assumptions else ''
+            r_ranges = 'Ranges: {}'.format(
+                ', '.join('{} ∈ [{}, {}]'.format(feature, lower, upper) for feature, (lower, upper) in ranges)
+            )
+            r_partition = '{} | {}'.format(r_assumptions, r_ranges) if r_assumptions else '{}'.format(r_ranges)
+            if unpacked:
+                _percent = percent / len(unpacked)
+                for item in unpacked:
+                    for states in check.values():
                         for state in states:
+                            for (_, assumption, _) in item:
+                                state.assume({assumption}, manager=manager)
                             # forget the sensitive variables
                             state.forget(self.sensitive)
-                    self.bias_check(r_partition, partition, ranges, percent)
-            with self.analyzed.get_lock():
-                self.analyzed.value += len(pack)
-            analyzed = self.analyzed.value
-            discarded = self.discarded.value
-            partitions = self.partitions.value
-            considered = partitions - discarded
-            biased = self.biased.value
-            progress = 'Progress for #{}: {} of {} partitions ({}% biased)'.format(id, analyzed, considered, biased)
-            print(Fore.YELLOW + progress, Style.RESET_ALL)
+                    biased += self.bias_check(r_partition, check, ranges, _percent)
+                    for state, polka in checkpoint:
+                        state.polka = polka
+            else:
+                for states in check.values():
+                    for state in states:
+                        # forget the sensitive variables
+                        state.forget(self.sensitive)
+                biased += self.bias_check(r_partition, check, ranges, percent)
+                for state, polka in checkpoint:
+                    state.polka = polka
+        return len(pack), biased
 
     def analyze(self, initial, inputs=None, outputs=None, activations=None, analysis=True):
         """Backward analysis checking for algorithmic bias
@@ -655,27 +738,28 @@ class BackwardInterpreter(Interpreter):
         :param outputs: (Set[VariableIdentifier]) output variables
         :param activations: (Set[Node]) CFG nodes corresponding to activation functions
         """
-        print(Fore.BLUE + '\n||==================================||')
+        print(tty(Fore.BLUE) + '\n||==================================||')
         print('|| domain: {}'.format(self.domain))
         print('|| min_difference: {}'.format(self.minL))
         print('|| start_difference: {}'.format(self.startL))
         print('|| start_widening: {}'.format(self.startU))
         print('|| max_widening: {}'.format(self.maxU))
-        print('||==================================||', Style.RESET_ALL)
+        print('||==================================||' + tty(Style.RESET_ALL))
         self._initial = initial
         with open(self.specification, 'r') as specification:
+            lines = iter([line.strip() for line in specification.read().splitlines()])
             """
             pick sensitive feature and fix its bounds / we assume one-hot encoding
             """
-            arity = int(specification.readline().strip())
+            arity = int(next(lines))
             self.sensitive = list()
             for i in range(arity):
-                self.sensitive.append(VariableIdentifier(specification.readline().strip()))
+                self.sensitive.append(VariableIdentifier(next(lines)))
             if arity > 1:   # the sensitive feature is one-hot encoded
                 self.values: List[OneHot1] = list(one_hots(self.sensitive))
             else:           # the sensitive feature is continuous
                 zero = Literal('0')
-                pivot = specification.readline().strip()
+                pivot = next(lines)
                 literal = Literal(pivot)
                 one = Literal('1')
                 self.values = list()
@@ -693,52 +777,59 @@ class BackwardInterpreter(Interpreter):
                 value2 = BinaryBooleanOperation(lower, BinaryBooleanOperation.Operator.And, upper)
                 _value2[self.sensitive[0]] = (eval(pivot), 1)
                 self.values.append((variable2, value2, tuple(_value2.items())))
-            # bound the sensitive feature between 0 and 1
-            zero = Literal('0')
-            one = Literal('1')
-            left = BinaryComparisonOperation(zero, BinaryComparisonOperation.Operator.LtE, self.sensitive[0])
-            right = BinaryComparisonOperation(self.sensitive[0], BinaryComparisonOperation.Operator.LtE, one)
-            self.bounds = BinaryBooleanOperation(left, BinaryBooleanOperation.Operator.And, right)
-            for sensitive in self.sensitive[1:]:
-                left = BinaryComparisonOperation(zero, BinaryComparisonOperation.Operator.LtE, sensitive)
-                right = BinaryComparisonOperation(sensitive, BinaryComparisonOperation.Operator.LtE, one)
-                conj = BinaryBooleanOperation(left, BinaryBooleanOperation.Operator.And, right)
-                self.bounds = BinaryBooleanOperation(self.bounds, BinaryBooleanOperation.Operator.And, conj)
             """
             determine the one-hot encoded uncontroversial features and fix their bounds
             """
             self.uncontroversial1 = list()
-            while True:
-                try:
-                    arity = specification.readline().strip()
-                    uncontroversial = list()
-                    for i in range(int(arity)):
-                        uncontroversial.append(VariableIdentifier(specification.readline().strip()))
-                    self.uncontroversial1.append(uncontroversial)
-                except ValueError:
+            for arity in lines:
+                if not arity.isdigit():     # no more one-hot encoded uncontroversial features
                     break
+                uncontroversial = list()
+                for i in range(int(arity)):
+                    uncontroversial.append(VariableIdentifier(next(lines)))
+                self.uncontroversial1.append(uncontroversial)
+            self.encoded = list(itertools.chain(*self.uncontroversial1))
             self.count = reduce(operator.mul, (len(encoding) for encoding in self.uncontroversial1), 1)
-            # bound the one-hot encoded uncontroversial features between 0 and 1
-            for encoding in self.uncontroversial1:
-                for uncontroversial in encoding:
-                    left = BinaryComparisonOperation(zero, BinaryComparisonOperation.Operator.LtE, uncontroversial)
-                    right = BinaryComparisonOperation(uncontroversial, BinaryComparisonOperation.Operator.LtE, one)
-                    conj = BinaryBooleanOperation(left, BinaryBooleanOperation.Operator.And, right)
-                    self.bounds = BinaryBooleanOperation(self.bounds, BinaryBooleanOperation.Operator.And, conj)
+            # bound the sensitive feature and the one-hot encoded uncontroversial features between 0 and 1
+            zero = Literal('0')
+            one = Literal('1')
+            lte = BinaryComparisonOperation.Operator.LtE
+            conj = BinaryBooleanOperation.Operator.And
+            bounds = [
+                BinaryBooleanOperation(BinaryComparisonOperation(zero, lte, var), conj, BinaryComparisonOperation(var, lte, one))
+                for var in itertools.chain(self.sensitive, self.encoded)
+            ]
+            self.bounds = conjunction(bounds)
             """
             determine the custom encoded uncontroversial features and fix their ranges
             """
-            self.uncontroversial2 = list(inputs - set(self.sensitive) - set(itertools.chain(*self.uncontroversial1)))
-            ranges: Dict[VariableIdentifier, Tuple[int, int]] = dict()
-            for uncontroversial in self.uncontroversial2:
-                ranges[uncontroversial] = (0, 1)
+            excluded = set(self.sensitive).union(self.encoded)
+            # sorted by name, for the ranges to be split in the same order at every run
+            self.uncontroversial2 = sorted((var for var in inputs if var not in excluded), key=lambda var: var.name)
+            self.r_uncontroversial2 = {uncontroversial: PyVar(uncontroversial.name) for uncontroversial in self.uncontroversial2}
+            ranges: Dict[VariableIdentifier, Tuple[int, int]] = dict.fromkeys(self.uncontroversial2, (0, 1))
             # for uncontroversial in self.uncontroversial2:
             #     left = BinaryComparisonOperation(zero, BinaryComparisonOperation.Operator.LtE, uncontroversial)
             #     right = BinaryComparisonOperation(uncontroversial, BinaryComparisonOperation.Operator.LtE, one)
             #     conj = BinaryBooleanOperation(left, BinaryBooleanOperation.Operator.And, right)
             #     self.bounds = BinaryBooleanOperation(self.bounds, BinaryBooleanOperation.Operator.And, conj)
         self.outputs = outputs
+        # the chosen output class must be greater than all the other output classes
+        self.outcomes = list()
+        lt, conj = BinaryComparisonOperation.Operator.Lt, BinaryBooleanOperation.Operator.And
+        for chosen in self.outputs:
+            remaining = self.outputs - {chosen}
+            discarded = remaining.pop()
+            outcome = BinaryComparisonOperation(discarded, lt, chosen)
+            for discarded in remaining:
+                cond = BinaryComparisonOperation(discarded, lt, chosen)
+                outcome = BinaryBooleanOperation(outcome, conj, cond)
+            self.outcomes.append((chosen, outcome))
         self.activations = activations
+        # the predecessor of each node of the CFG (for the backward analysis)
+        self.predecessors = dict()
+        for source, target in self.cfg.edges:
+            self.predecessors[self.cfg.nodes[target.identifier]] = self.cfg.nodes[source.identifier]
         cpu = self.cpu
         print('\nAvailable CPUs: {}'.format(cpu))
         colors = [
@@ -751,39 +842,42 @@ class BackwardInterpreter(Interpreter):
             Back.LIGHTGREEN_EX + Fore.BLACK,
             Back.YELLOW + Fore.BLACK,
         ]
+        colors = list(itertools.islice(itertools.cycle(colors), cpu))     # one color per process
         """
         do the pre-analysis
         """
-        print(Fore.BLUE + '\n||==============||')
+        print(tty(Fore.BLUE) + '\n||==============||')
         print('|| Pre-Analysis ||')
-        print('||==============||\n', Style.RESET_ALL)
+        print('||==============||\n' + tty(Style.RESET_ALL))
         # prepare the queue
-        queue1 = Manager().Queue()
-        queue1.put((list(), (0, 0), self.startL, self.startU, 0, list(), list(ranges.items()), 0, list(self.uncontroversial2), 100, None))
+        queue1 = Queue()
+        queue1.put(((), (0, 0), self.startL, self.startU, 0, (), tuple(ranges.items()), 0, tuple(self.uncontroversial2), 100, None))
         # run the pre-analysis
         start1 = time.time()
+        results = Queue()
         processes = list()
         for i in range(cpu):
-            color = colors[i % len(colors)]
-            process = Process(target=self.worker1, args=(i, color, queue1, PyBoxMPQManager()))
+            color = colors[i]
+            process = Process(target=self.worker1, args=(i, color, queue1, PyBoxMPQManager(), results))
             processes.append(process)
             process.start()
+        for _ in processes:     # merge the packs found by each process (before joining to avoid deadlocks)
+            for key, pack in results.get(block=True).items():
+                self.patterns.setdefault(key, set()).update(pack)
         for process in processes:
             process.join()
         end1 = time.time()
         if self.autotuning:
-            print(Fore.BLUE + "\nAutotuned to: L = {}, U = {}".format(self.lower.value, self.upper.value), Style.RESET_ALL)
+            cprint(Fore.BLUE, "\nAutotuned to: L = {}, U = {}".format(self.lower.value, self.upper.value))
         #
         patterns = len(self.patterns)
         discarded = self.discarded.value
         partitions = self.partitions.value
         considered = partitions - discarded
-        print(Fore.BLUE + '\nFound: {} patterns for {}[{}] partitions'.format(patterns, considered, partitions))
+        print(tty(Fore.BLUE) + '\nFound: {} patterns for {}[{}] partitions'.format(patterns, considered, partitions))
         prioritized = sorted(self.patterns.items(), key=lambda v: len(v[1]), reverse=True)
         for key, pack in prioritized:
-            sset = lambda s: '{{{}}}'.format(', '.join('{}'.format(e) for e in s))
-            skey = ' | '.join('{}, {}'.format(sset(pair[0]), sset(pair[1])) for pair in key)
-            print(skey, '->', len(pack))
+            print(_skey(key), '->', len(pack))
         #
         expanded = dict()
         idx = 0
@@ -823,46 +917,43 @@ class BackwardInterpreter(Interpreter):
         # if len(compressed) < len(self.patterns):
         #     print('Compressed to: {} patterns'.format(len(compressed)))
         #     for key, pack in prioritized:
-        #         sset = lambda s: '{{{}}}'.format(', '.join('{}'.format(e) for e in s))
-        #         skey = ' | '.join('{}, {}'.format(sset(pair[0]), sset(pair[1])) for pair in key)
-        #         print(skey, '->', len(pack))
+        #         print(_skey(key), '->', len(pack))
         #
         result = '\nPre-Analysis Result: {}% fair ({}% feasible)'.format(self.fair.value, self.feasible.value)
-        print(Fore.BLUE + result)
-        print('Pre-Analysis Time: {}s'.format(end1 - start1), Style.RESET_ALL)
+        print(tty(Fore.BLUE) + result)
+        print('Pre-Analysis Time: {}s'.format(end1 - start1) + tty(Style.RESET_ALL))
 
         """
         do the analysis
         """
         if analysis:
-            print(Fore.BLUE + '\n||==========||')
+            print(tty(Fore.BLUE) + '\n||==========||')
             print('|| Analysis ||')
-            print('||==========||\n', Style.RESET_ALL)
-            # prepare the queue
-            queue2 = Queue()
-            for idx, idxkeypack in enumerate(expanded.items()):
-                (_, (key, pack)) = idxkeypack
-            # for idx, (key, pack) in enumerate(prioritized):
-                queue2.put((idx+1, (key, pack)))
-            queue2.put((None, (None, None)))
+            print('||==========||\n' + tty(Style.RESET_ALL))
+            # prepare the patterns
+            patterns = list(expanded.values())
+            # patterns = prioritized
             # run the analysis
             start2 = time.time()
-            processes = list()
-            for i in range(cpu):
-                color = colors[i % len(colors)]
-                man = PyPolkaMPQstrictManager()
-                process = Process(target=self.worker2, args=(i, color, queue2, man, len(expanded)))
-                # process = Process(target=self.worker2, args=(i, color, queue2, man, len(compressed)))
-                processes.append(process)
-                process.start()
-            for process in processes:
-                process.join()
+            # the patterns are inherited by forking the worker processes, so only their indices need to be pickled;
+            # each pattern is a whole backward analysis, so it is dispatched on its own for load balancing
+            initargs = (self, patterns, Value('i', 0), colors)
+            with get_context('fork').Pool(cpu, initializer=_init_analysis, initargs=initargs) as pool:
+                # the counters are only updated here, instead of by each worker process under a shared lock
+                considered = self.partitions.value - self.discarded.value
+                for id, analyzed, biased in pool.imap_unordered(_analyze_pattern, range(len(patterns)), chunksize=1):
+                    self.analyzed.value += analyzed
+                    self.biased.value += biased
+                    progress = 'Progress for #{}: {} of {} partitions ({}% biased)'.format(id, self.analyzed.value, considered, self.biased.value)
+                    cprint(Fore.YELLOW, progress)
+                pool.close()    # let the worker processes exit (and flush their output) instead of terminating them
+                pool.join()
             end2 = time.time()
             #
             result = '\nResult: {}% of {}% ({}% biased)'.format(self.feasible.value, self.explored.value, self.biased.value)
-            print(Fore.BLUE + result)
+            print(tty(Fore.BLUE) + result)
             print('Pre-Analysis Time: {}s'.format(end1 - start1))
-            print('Analysis Time: {}s'.format(end2 - start2), Style.RESET_ALL)
+            print('Analysis Time: {}s'.format(end2 - start2) + tty(Style.RESET_ALL))
 
             log = '{} ({}% certified in the pre-analysis, {}% biased) {}s {}s'.format(self.feasible.value, self.fair.value, self.biased.value, end1 - start1, end2 - start2)
         else:
@@ -897,6 +988,5 @@ class BiasBackwardSemantics(DefaultBackwardSemantics):
             neg = PyTexpr1.binop(TexprOp.AP_TEXPR_SUB, zero, expr, rtype, rdir)
             cond = PyTcons1.make(neg, ConsTyp.AP_CONS_SUP)
             abstract1 = PyPolka(manager, state.environment, array=PyTcons1Array([cond]))
-            zero = PyTexpr1.cst(state.environment, PyMPQScalarCoeff(0.0))
             state.polka = state.polka.substitute(stmt, zero).meet(abstract1)
             return state
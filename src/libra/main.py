@@ -5,7 +5,6 @@ Libra Static Neural Network Analyzer
 :Author: Caterina Urban
 """
 import argparse
-from multiprocessing import cpu_count
 
 from libra.engine.bias_analysis import BiasAnalysis, AbstractDomain
 
@@ -83,7 +82,7 @@ def main():
         '--cpu',
         help='number of CPUs to be used for the analysis',
         type=int,
-        default=cpu_count())
+        default=None)
 
     args = parser.parse_args()
 